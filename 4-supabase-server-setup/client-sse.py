@@ -1,26 +1,21 @@
 """
-MCP SSE Client for Supabase MCP Server
+MCP HTTP Client for Supabase MCP Server
 
-Connects to the MCP server via SSE transport and demonstrates usage of Supabase tools.
+Connects to the MCP server via Streamable HTTP transport and demonstrates usage of Supabase tools.
 Follows PEP8, uses type hints, and includes Google-style docstrings.
 """
 import os
+import sys
 import asyncio
 import nest_asyncio
 from mcp import ClientSession
-from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
 from dotenv import load_dotenv
 
-nest_asyncio.apply()  # Needed to run interactive python
-
-load_dotenv("../.env")
-
-MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:3000")
-
 """
 Make sure:
 1. The Supabase MCP server is running before running this script.
-2. The server is configured to use SSE transport.
+2. The server is configured to use Streamable HTTP transport.
 3. The server is listening on port 3000 (default).
 
 To run the server:
@@ -42,9 +37,13 @@ def print_result(label: str, result):
 
 async def main():
     """
-    Demonstrates calling Supabase MCP tools using SSE transport.
+    Demonstrates calling Supabase MCP tools using Streamable HTTP transport.
     """
-    async with sse_client(f"{MCP_SERVER_URL}/sse") as (read_stream, write_stream):
+    # Reason: Loading .env here keeps importing this module free of filesystem side effects.
+    load_dotenv("../.env")
+    server_url = os.environ.get("MCP_SERVER_URL", "http://localhost:3000")
+
+    async with streamablehttp_client(f"{server_url}/mcp") as (read_stream, write_stream, _):
         async with ClientSession(read_stream, write_stream) as session:
             # Initialize the connection
             await session.initialize()
@@ -72,4 +71,7 @@ async def main():
             # print_result("Delete Result", delete_result)
 
 if __name__ == "__main__":
+    # Reason: nest_asyncio patches asyncio globally; only Jupyter/IPython needs it.
+    if "ipykernel" in sys.modules:
+        nest_asyncio.apply()  # Needed to run interactive python
     asyncio.run(main())
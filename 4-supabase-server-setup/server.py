@@ -9,13 +9,22 @@ Follows PEP8, uses pydantic V2, and FastMCP for APIs.
 """
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
-from typing import List, Any, Dict
-from pydantic import BaseModel, field_validator
-from supabase import create_client, Client
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from typing import Annotated, List, Any, AsyncIterator, Dict, Optional
+import httpx
+import uvicorn
+from pydantic import BaseModel, ConfigDict, StringConstraints
+from starlette.applications import Starlette
+from supabase import AsyncClient, acreate_client
 
 load_dotenv("C:/Users/LENOVO/Desktop/100 Days Challenge/mcp-basics/4-supabase-server-setup/.env")
 
+logger = logging.getLogger(__name__)
+
 # --- Supabase connection setup ---
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
@@ -23,35 +32,205 @@ SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Reason: The async client lets tool calls await network I/O instead of blocking the
+# event loop. It must be awaited to construct, so it is created lazily on first use.
+_supabase: Optional[AsyncClient] = None
+_supabase_lock = asyncio.Lock()
+
+# Reason: Keep-alive connections spare each tool call a TCP/TLS handshake, and the bounded
+# pool caps concurrent sockets. httpx ignores client-level limits when a transport is given,
+# so they are set on the transport itself. http2=True requires the `httpx[http2]` extra.
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+def _build_http_client(postgrest: Any) -> httpx.AsyncClient:
+    """
+    Build a pooled HTTP client that talks to the same PostgREST endpoint as `postgrest`.
+
+    Args:
+        postgrest (AsyncPostgrestClient): The PostgREST client created by Supabase.
+
+    Returns:
+        httpx.AsyncClient: A client with tuned keep-alive and connection limits.
+    """
+    # Reason: TLS verification and proxy live on the transport, so replacing the transport
+    # would silently drop them; carry over whatever the PostgREST client was built with.
+    transport = httpx.AsyncHTTPTransport(
+        limits=HTTP_LIMITS,
+        http2=True,
+        retries=2,
+        verify=getattr(postgrest, "verify", True),
+        proxy=getattr(postgrest, "proxy", None),
+    )
+    session = postgrest.session
+    return httpx.AsyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        transport=transport,
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    )
+
+
+async def get_supabase() -> AsyncClient:
+    """
+    Return the shared async Supabase client, creating it on first use.
+
+    Returns:
+        AsyncClient: The shared Supabase client.
+    """
+    global _supabase
+    if _supabase is None:
+        async with _supabase_lock:
+            # Reason: Another coroutine may have created the client while we waited.
+            if _supabase is None:
+                client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+                # Reason: table() and rpc() both go through the PostgREST session.
+                default_session = client.postgrest.session
+                client.postgrest.session = _build_http_client(client.postgrest)
+                await default_session.aclose()
+                _supabase = client
+    return _supabase
+
+
+async def close_supabase() -> None:
+    """
+    Close the shared Supabase client's connection pool, if it was opened.
+    """
+    global _supabase
+    async with _supabase_lock:
+        client, _supabase = _supabase, None
+    # Reason: The client is detached before closing, so a concurrent get_supabase()
+    # builds a fresh client instead of receiving one that is being closed.
+    if client is not None:
+        await client.postgrest.aclose()
+
+
+async def warm_up_supabase() -> None:
+    """
+    Open a pooled connection before the first tool call and check the credentials.
+
+    Raises:
+        RuntimeError: If the Supabase API gateway rejects the configured key.
+    """
+    # Reason: A cheap RPC moves DNS and TLS setup out of the first tool call. It is sent
+    # through the raw session because postgrest's APIError does not reliably carry the
+    # HTTP status. Only a rejected key is fatal; anything else is logged and the tools
+    # still get a chance to work.
+    try:
+        supabase = await get_supabase()
+        response = await supabase.postgrest.session.post("/rpc/list_public_tables", json={})
+    except Exception as e:
+        logger.warning("Supabase warm-up failed: %s", e)
+        return
+    if not response.is_error:
+        return
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    # Reason: PostgREST errors always carry a `code` (e.g. 42501 when the role may not
+    # execute this function) and do not mean the key is bad. A 401/403 without one comes
+    # from the API gateway, e.g. "Invalid API key", and every tool call would fail too.
+    if response.status_code in (401, 403) and "code" not in body:
+        message = body.get("message") or response.text
+        # Reason: Over stdio the client only sees a failed initialize(), so log the cause.
+        logger.error("Supabase rejected the configured key (HTTP %s): %s", response.status_code, message)
+        raise RuntimeError(f"Supabase rejected the configured key (HTTP {response.status_code}): {message}")
+    logger.warning(
+        "Supabase warm-up returned HTTP %s: %s", response.status_code, body.get("message") or response.text
+    )
+
+
+@asynccontextmanager
+async def supabase_pool() -> AsyncIterator[None]:
+    """
+    Own the shared Supabase connection pool for the lifetime of the server process.
+
+    Yields:
+        None
+    """
+    await warm_up_supabase()
+    try:
+        yield
+    finally:
+        await close_supabase()
+
+
+def with_supabase_pool(app: Starlette) -> Starlette:
+    """
+    Run the Supabase connection pool inside an HTTP app's own lifespan.
+
+    Args:
+        app (Starlette): The app built by FastMCP.
+
+    Returns:
+        Starlette: The same app, now opening the pool on startup and closing it on shutdown.
+    """
+    # Reason: FastMCP's lifespan runs once per client session on HTTP transports, so the pool
+    # is tied to the app lifespan instead and survives clients connecting and disconnecting.
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[Any]:
+        async with app_lifespan(app) as state:
+            async with supabase_pool():
+                yield state
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+async def run_stdio() -> None:
+    """
+    Serve the MCP server over stdio with the Supabase connection pool open.
+    """
+    async with supabase_pool():
+        await mcp.run_stdio_async()
 
 # --- Pydantic models ---
+# Reason: Request models are never mutated after validation, and extra="forbid" surfaces
+# misspelled tool arguments instead of silently dropping them. Non-empty checks are declared
+# as constraints so pydantic-core enforces them without calling back into Python.
+REQUEST_MODEL_CONFIG = ConfigDict(
+    frozen=True,
+    extra="forbid",
+    str_strip_whitespace=True,
+    validate_default=False,
+)
+NonEmptyStr = Annotated[str, StringConstraints(min_length=1)]
+
 class ListTablesResponse(BaseModel):
     tables: List[str]
 
 class SQLQueryRequest(BaseModel):
-    sql: str
+    model_config = REQUEST_MODEL_CONFIG
 
-    @field_validator('sql')
-    @classmethod
-    def validate_sql(cls, v: str, info) -> str:
-        if not v.strip():
-            raise ValueError("SQL query must not be empty.")
-        return v
+    sql: NonEmptyStr
 
 class SQLQueryResponse(BaseModel):
     data: Any
 
 class TableRowRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     row: dict
 
 class TableRowUpdateRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     match: dict
     values: dict
 
 class TableRowDeleteRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     match: dict
 
@@ -66,7 +245,7 @@ mcp = FastMCP(
 )
 
 @mcp.tool()
-def list_tables() -> ListTablesResponse:
+async def list_tables() -> ListTablesResponse:
     """
     List all tables in the public schema of the Supabase database.
 
@@ -74,12 +253,13 @@ def list_tables() -> ListTablesResponse:
         ListTablesResponse: List of table names.
     """
     # Reason: Supabase REST API does not expose information_schema, so we use a custom RPC.
-    result = supabase.rpc("list_public_tables").execute()
-    tables = [row["table_name"] for row in result.data] if result.data else []
+    supabase = await get_supabase()
+    result = await supabase.rpc("list_public_tables").execute()
+    tables = list(map(itemgetter("table_name"), result.data)) if result.data else []
     return ListTablesResponse(tables=tables)
 
 @mcp.tool()
-def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
+async def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
     """
     Run an arbitrary SQL query on the Supabase database.
 
@@ -90,11 +270,12 @@ def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
         SQLQueryResponse: The query result data.
     """
     # Reason: This uses the Supabase RPC to run SQL. Use with caution.
-    result = supabase.rpc("execute_sql", {"sql": request.sql}).execute()
+    supabase = await get_supabase()
+    result = await supabase.rpc("execute_sql", {"sql": request.sql}).execute()
     return SQLQueryResponse(data=result.data)
 
 @mcp.tool()
-def insert_row(request: TableRowRequest) -> TableRowResponse:
+async def insert_row(request: TableRowRequest) -> TableRowResponse:
     """
     Insert a row into a Supabase table.
 
@@ -105,11 +286,12 @@ def insert_row(request: TableRowRequest) -> TableRowResponse:
         TableRowResponse: Inserted row data or error.
     """
     # Reason: Uses Supabase Python client for type-safe insert.
-    result = supabase.table(request.table).insert(request.row).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).insert(request.row).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def update_row(request: TableRowUpdateRequest) -> TableRowResponse:
+async def update_row(request: TableRowUpdateRequest) -> TableRowResponse:
     """
     Update rows in a Supabase table matching criteria.
 
@@ -120,11 +302,12 @@ def update_row(request: TableRowUpdateRequest) -> TableRowResponse:
         TableRowResponse: Updated row data or error.
     """
     # Reason: Uses Supabase Python client for type-safe update.
-    result = supabase.table(request.table).update(request.values).match(request.match).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).update(request.values).match(request.match).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def delete_row(request: TableRowDeleteRequest) -> TableRowResponse:
+async def delete_row(request: TableRowDeleteRequest) -> TableRowResponse:
     """
     Delete rows from a Supabase table matching criteria.
 
@@ -135,17 +318,26 @@ def delete_row(request: TableRowDeleteRequest) -> TableRowResponse:
         TableRowResponse: Deleted row data or error.
     """
     # Reason: Uses Supabase Python client for type-safe delete.
-    result = supabase.table(request.table).delete().match(request.match).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).delete().match(request.match).execute()
     return TableRowResponse(data=result.data)
 
 # --- Main entry ---
 if __name__ == "__main__":
-    transport = "sse"
+    transport = "streamable-http"
     if transport == "stdio":
         print("Running server with stdio transport")
-        mcp.run(transport="stdio")
+        asyncio.run(run_stdio())
+    elif transport == "streamable-http":
+        print("Running server with Streamable HTTP transport (legacy SSE at /sse)")
+        # Reason: Streamable HTTP answers one-shot tool calls without holding an event stream
+        # open. The SSE routes stay on the same app for clients that have not migrated yet.
+        app = with_supabase_pool(mcp.streamable_http_app())
+        app.router.routes.extend(mcp.sse_app().routes)
+        uvicorn.run(app, host=mcp.settings.host, port=mcp.settings.port)
     elif transport == "sse":
         print("Running server with SSE transport")
-        mcp.run(transport="sse")
+        app = with_supabase_pool(mcp.sse_app())
+        uvicorn.run(app, host=mcp.settings.host, port=mcp.settings.port)
     else:
         raise ValueError(f"Unknown transport: {transport}")
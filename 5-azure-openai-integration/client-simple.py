@@ -1,43 +1,98 @@
 import asyncio
-import json
+import logging
+import sys
+import time
+from collections import deque
 from contextlib import AsyncExitStack
 from typing import Any, Dict, List
 
 import os
+import httpx
 import nest_asyncio
+import orjson
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
-from openai import AsyncAzureOpenAI
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 
-# Apply nest_asyncio to allow nested event loops (needed for Jupyter/IPython)
-nest_asyncio.apply()
-
-# Load environment variables
-load_dotenv("../.env")
-
-AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION")
-AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
-
-print("ENDPOINT:", os.environ.get("AZURE_OPENAI_ENDPOINT"))
-print("API KEY:", os.environ.get("AZURE_OPENAI_API_KEY"))
-print("API VERSION:", os.environ.get("AZURE_OPENAI_API_VERSION"))
+logger = logging.getLogger(__name__)
 
 # Global variables to store session state
 session = None
 exit_stack = AsyncExitStack()
-openai_client = AsyncAzureOpenAI(
-    api_key=AZURE_OPENAI_API_KEY,
-    api_version=AZURE_OPENAI_API_VERSION,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT
-)
+openai_client: AsyncAzureOpenAI | None = None
 model = "gpt-4.1"
 stdio = None
 write = None
 
-# Short-term memory for chat history (in-memory, not persisted)
-chat_history: list[dict[str, str]] = []
+# System message instructing the assistant to use ReAct and lowercase tool_call attributes
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "You are an AI assistant that uses the ReAct (Reason + Act) pattern. "
+        "For every user query, first reason step-by-step about how to solve the problem, "
+        "then act by calling the appropriate tool or providing an answer. "
+        "When calling tools, always use lower case for all attribute names in tool_calls arguments. "
+        "Format your response as:\n"
+        "Reason: <your reasoning>\n"
+        "Act: <your action or tool call>"
+    ),
+}
+
+# Short-term memory for chat history (in-memory, not persisted): last 10 user+assistant pairs.
+# Reason: A bounded deque drops the oldest turns itself, so memory stays constant over long
+# sessions. The system message is kept separately so it is never evicted.
+chat_history: deque[dict[str, str]] = deque(maxlen=20)
+
+# Cached OpenAI-format tool list as (fetched_at, tools); the tool list rarely changes
+# within a session, so it is only refreshed after the TTL or a list_changed notification.
+_tools_cache: tuple[float, list[dict[str, Any]]] | None = None
+_TOOLS_TTL = 60.0
+
+
+def invalidate_tools_cache() -> None:
+    """Drop the cached tool list so the next query fetches it again."""
+    global _tools_cache
+    _tools_cache = None
+
+
+async def handle_server_message(message: Any) -> None:
+    """Handle incoming MCP server messages, invalidating the tool cache when tools change.
+
+    Args:
+        message: A server request responder, notification, or exception.
+    """
+    if isinstance(message, types.ServerNotification) and isinstance(
+        message.root, types.ToolListChangedNotification
+    ):
+        invalidate_tools_cache()
+
+
+def create_openai_client() -> AsyncAzureOpenAI:
+    """Create the Azure OpenAI client from environment variables.
+
+    Returns:
+        The configured Azure OpenAI client.
+    """
+    api_version = os.environ.get("AZURE_OPENAI_API_VERSION")
+    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
+    print("ENDPOINT:", endpoint)
+    print("API VERSION:", api_version)
+    # Reason: Keep-alive connections avoid a TLS handshake per completion, and HTTP/2 lets
+    # concurrent requests share one connection. http2=True requires the `httpx[http2]` extra.
+    # DefaultAsyncHttpxClient keeps the SDK's defaults (e.g. follow_redirects) and only
+    # overrides what is passed here.
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    return AsyncAzureOpenAI(
+        api_key=os.environ.get("AZURE_OPENAI_API_KEY"),
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        http_client=http_client,
+    )
 
 
 async def connect_to_server(server_script_path: str = "server.py"):
@@ -57,16 +112,21 @@ async def connect_to_server(server_script_path: str = "server.py"):
     # Connect to the server
     stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
     stdio, write = stdio_transport
-    session = await exit_stack.enter_async_context(ClientSession(stdio, write))
+    session = await exit_stack.enter_async_context(
+        ClientSession(stdio, write, message_handler=handle_server_message)
+    )
+    invalidate_tools_cache()
 
     # Initialize the connection
     await session.initialize()
 
     # List available tools
-    tools_result = await session.list_tools()
+    # Reason: Fetching through get_mcp_tools primes the tool cache, so the first query
+    # reuses this listing instead of making another round-trip.
+    tools = await get_mcp_tools()
     print("\nConnected to server with tools:")
-    for tool in tools_result.tools:
-        print(f"  - {tool.name}: {tool.description}")
+    for tool in tools:
+        print(f"  - {tool['function']['name']}: {tool['function']['description']}")
 
 
 async def get_mcp_tools() -> List[Dict[str, Any]]:
@@ -75,10 +135,14 @@ async def get_mcp_tools() -> List[Dict[str, Any]]:
     Returns:
         A list of tools in OpenAI format.
     """
-    global session
+    global session, _tools_cache
+
+    # Reason: Skips a full MCP round-trip and the list rebuild on every user turn.
+    if _tools_cache is not None and time.monotonic() - _tools_cache[0] < _TOOLS_TTL:
+        return _tools_cache[1]
 
     tools_result = await session.list_tools()
-    return [
+    tools = [
         {
             "type": "function",
             "function": {
@@ -89,6 +153,21 @@ async def get_mcp_tools() -> List[Dict[str, Any]]:
         }
         for tool in tools_result.tools
     ]
+    _tools_cache = (time.monotonic(), tools)
+    return tools
+
+
+async def call_tool(tool_call: Any) -> types.CallToolResult:
+    """Execute a single OpenAI tool call against the MCP server.
+
+    Args:
+        tool_call: The tool call requested by the model.
+
+    Returns:
+        The MCP tool call result.
+    """
+    args = orjson.loads(tool_call.function.arguments)
+    return await session.call_tool(tool_call.function.name, arguments=args)
 
 
 async def process_query(query: str) -> str:
@@ -110,7 +189,7 @@ async def process_query(query: str) -> str:
     tools = await get_mcp_tools()
 
     # Prepare messages for OpenAI (short-term memory: last 10 exchanges)
-    messages = chat_history[-20:]  # 10 user+assistant pairs
+    messages = [SYSTEM_MESSAGE, *chat_history]
 
     # Initial OpenAI API call
     response = await openai_client.chat.completions.create(
@@ -122,32 +201,36 @@ async def process_query(query: str) -> str:
 
     # Get assistant's response
     assistant_message = response.choices[0].message
-    print(f"Assistant: {assistant_message}")
+    # Reason: Lazy %s formatting skips repr-ing large responses unless debug logging is on.
+    logger.debug("Assistant: %s", assistant_message)
     chat_history.append({"role": "assistant", "content": assistant_message.content or ""})
 
     # Handle tool calls if present
     if assistant_message.tool_calls:
+        # Reason: ClientSession matches responses by request id, so independent tool calls
+        # can be in flight at once; one RTT instead of one per call.
+        results = await asyncio.gather(
+            *(call_tool(tool_call) for tool_call in assistant_message.tool_calls),
+            return_exceptions=True,
+        )
         tool_messages = []
-        for tool_call in assistant_message.tool_calls:
-            # Normalize argument keys to lowercase
-            args = json.loads(tool_call.function.arguments)
-            result = await session.call_tool(
-                tool_call.function.name,
-                arguments=args,
-            )
-            print(f"Tool call result: {result}")
+        for tool_call, result in zip(assistant_message.tool_calls, results):
+            logger.debug("Tool call result: %s", result)
+            # Reason: Every tool_call_id needs a tool message, or the follow-up call is rejected.
+            content = f"Error: {result}" if isinstance(result, BaseException) else result.content
             tool_messages.append({
                 "role": "tool",
                 "tool_call_id": tool_call.id,
-                "content": result.content,
+                "content": content,
             })
 
-        print(f"Tool messages: {tool_messages}")
+        logger.debug("Tool messages: %s", tool_messages)
         # Build a temporary message list for OpenAI: chat_history + assistant_message + tool_messages
+        # Reason: No tail slice is needed since chat_history is already bounded.
         followup_messages = messages + [assistant_message] + tool_messages
         final_response = await openai_client.chat.completions.create(
             model=model,
-            messages=followup_messages[-20:],
+            messages=followup_messages,
             tools=tools,
             tool_choice="none",
         )
@@ -162,30 +245,27 @@ async def cleanup():
     """Clean up resources."""
     global exit_stack
     await exit_stack.aclose()
+    if openai_client is not None:
+        await openai_client.close()
 
 
 async def main():
     """
     Main entry point for the client. Runs an interactive chat loop with the user.
     """
+    global openai_client
+    logging.basicConfig(level=logging.INFO)
+    # Reason: httpx and mcp log every request at INFO, which would clutter the chat.
+    for name in ("httpx", "mcp"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    # Reason: Loading .env here keeps importing this module free of filesystem side effects.
+    load_dotenv("../.env")
+    openai_client = create_openai_client()
     await connect_to_server("server.py")
 
     print("\nWelcome to the Azure OpenAI MCP Chat! Type 'exit' to quit.\n")
-    # Add a system message to instruct the assistant to use ReAct and lowercase tool_call attributes
-    system_message = {
-        "role": "system",
-        "content": (
-            "You are an AI assistant that uses the ReAct (Reason + Act) pattern. "
-            "For every user query, first reason step-by-step about how to solve the problem, "
-            "then act by calling the appropriate tool or providing an answer. "
-            "When calling tools, always use lower case for all attribute names in tool_calls arguments. "
-            "Format your response as:\n"
-            "Reason: <your reasoning>\n"
-            "Act: <your action or tool call>"
-        ),
-    }
-    global chat_history
-    chat_history = [system_message]
+    chat_history.clear()
     try:
         while True:
             query = input("You: ").strip()
@@ -201,4 +281,8 @@ async def main():
 
 
 if __name__ == "__main__":
+    # Reason: nest_asyncio patches asyncio globally and slows every await; it is only needed
+    # to run the event loop inside Jupyter/IPython, which already has one running.
+    if "ipykernel" in sys.modules:
+        nest_asyncio.apply()
     asyncio.run(main())
\ No newline at end of file
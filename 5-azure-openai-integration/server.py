@@ -9,10 +9,13 @@ Follows PEP8, uses pydantic V2, and FastMCP for APIs.
 """
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+import asyncio
 import os
-from typing import List, Any, Dict
-from pydantic import BaseModel, field_validator
-from supabase import create_client, Client
+from operator import itemgetter
+from typing import Annotated, List, Any, Dict
+import uvicorn
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from supabase_pool import get_supabase, run_stdio, with_supabase_pool
 
 load_dotenv("../.env")
 
@@ -23,35 +26,48 @@ SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # --- Pydantic models ---
+# Reason: Request models are never mutated after validation, and extra="forbid" surfaces
+# misspelled tool arguments instead of silently dropping them. Non-empty checks are declared
+# as constraints so pydantic-core enforces them without calling back into Python.
+REQUEST_MODEL_CONFIG = ConfigDict(
+    frozen=True,
+    extra="forbid",
+    str_strip_whitespace=True,
+    validate_default=False,
+)
+NonEmptyStr = Annotated[str, StringConstraints(min_length=1)]
+# Reason: Spaces are part of what a substring search matches, and an empty pattern would
+# match every row, so search text is kept verbatim but must not be empty.
+SearchText = Annotated[str, StringConstraints(strip_whitespace=False, min_length=1)]
+
 class ListTablesResponse(BaseModel):
     tables: List[str]
 
 class SQLQueryRequest(BaseModel):
-    sql: str
+    model_config = REQUEST_MODEL_CONFIG
 
-    @field_validator('sql')
-    @classmethod
-    def validate_sql(cls, v: str, info) -> str:
-        if not v.strip():
-            raise ValueError("SQL query must not be empty.")
-        return v
+    sql: NonEmptyStr
 
 class SQLQueryResponse(BaseModel):
     data: Any
 
 class TableRowRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     row: dict
 
 class TableRowUpdateRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     match: dict
     values: dict
 
 class TableRowDeleteRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     match: dict
 
@@ -59,52 +75,40 @@ class TableRowResponse(BaseModel):
     data: Any
 
 class BulkInsertRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
-    rows: List[Dict[str, Any]]
+    rows: Annotated[List[Dict[str, Any]], Field(min_length=1)]
 
-    @field_validator('rows')
-    @classmethod
-    def validate_rows(cls, v, info):
-        if not v or not isinstance(v, list):
-            raise ValueError("Rows must be a non-empty list of dictionaries.")
-        return v
+class BulkUpsertRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
+    table: str
+    rows: Annotated[List[Dict[str, Any]], Field(min_length=1)]
+    on_conflict: str = "id"
 
 class BulkUpdateRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     match: Dict[str, Any]
-    values: Dict[str, Any]
-
-    @field_validator('values')
-    @classmethod
-    def validate_values(cls, v, info):
-        if not v or not isinstance(v, dict):
-            raise ValueError("Values must be a non-empty dictionary.")
-        return v
+    values: Annotated[Dict[str, Any], Field(min_length=1)]
 
 class FilterRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
     filters: Dict[str, Any]
     limit: int = 10
 
-    @field_validator('filters')
-    @classmethod
-    def validate_filters(cls, v, info):
-        if not isinstance(v, dict):
-            raise ValueError("Filters must be a dictionary.")
-        return v
-
 class SearchRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     table: str
-    column: str
-    query: str
+    column: NonEmptyStr
+    query: SearchText
     limit: int = 10
-
-    @field_validator('column')
-    @classmethod
-    def validate_column(cls, v, info):
-        if not v or not isinstance(v, str):
-            raise ValueError("Column must be a non-empty string.")
-        return v
+    prefix: bool = False
 
 # --- MCP server setup ---
 mcp = FastMCP(
@@ -114,7 +118,7 @@ mcp = FastMCP(
 )
 
 @mcp.tool()
-def list_tables() -> ListTablesResponse:
+async def list_tables() -> ListTablesResponse:
     """
     List all tables in the public schema of the Supabase database.
 
@@ -122,12 +126,13 @@ def list_tables() -> ListTablesResponse:
         ListTablesResponse: List of table names.
     """
     # Reason: Supabase REST API does not expose information_schema, so we use a custom RPC.
-    result = supabase.rpc("list_public_tables").execute()
-    tables = [row["table_name"] for row in result.data] if result.data else []
+    supabase = await get_supabase()
+    result = await supabase.rpc("list_public_tables").execute()
+    tables = list(map(itemgetter("table_name"), result.data)) if result.data else []
     return ListTablesResponse(tables=tables)
 
 @mcp.tool()
-def insert_row(request: TableRowRequest) -> TableRowResponse:
+async def insert_row(request: TableRowRequest) -> TableRowResponse:
     """
     Insert a row into a Supabase table.
 
@@ -138,11 +143,12 @@ def insert_row(request: TableRowRequest) -> TableRowResponse:
         TableRowResponse: Inserted row data or error.
     """
     # Reason: Uses Supabase Python client for type-safe insert.
-    result = supabase.table(request.table).insert(request.row).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).insert(request.row).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def update_row(request: TableRowUpdateRequest) -> TableRowResponse:
+async def update_row(request: TableRowUpdateRequest) -> TableRowResponse:
     """
     Update rows in a Supabase table matching criteria.
 
@@ -153,11 +159,12 @@ def update_row(request: TableRowUpdateRequest) -> TableRowResponse:
         TableRowResponse: Updated row data or error.
     """
     # Reason: Uses Supabase Python client for type-safe update.
-    result = supabase.table(request.table).update(request.values).match(request.match).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).update(request.values).match(request.match).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def delete_row(request: TableRowDeleteRequest) -> TableRowResponse:
+async def delete_row(request: TableRowDeleteRequest) -> TableRowResponse:
     """
     Delete rows from a Supabase table matching criteria.
 
@@ -168,13 +175,14 @@ def delete_row(request: TableRowDeleteRequest) -> TableRowResponse:
         TableRowResponse: Deleted row data or error.
     """
     # Reason: Uses Supabase Python client for type-safe delete.
-    result = supabase.table(request.table).delete().match(request.match).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).delete().match(request.match).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def get_table_schema(table: str) -> Dict[str, Any]:
+async def get_table_schema(table: str) -> Dict[str, Any]:
     """
-    Get the schema (columns and types) for a given table via the execute_sql RPC.
+    Get the schema (columns and types) for a given table via the get_columns RPC.
 
     Args:
         table (str): Table name.
@@ -182,56 +190,52 @@ def get_table_schema(table: str) -> Dict[str, Any]:
     Returns:
         dict: Mapping of column_name -> data_type, or an error message.
     """
-    # 1. Validate to prevent SQL injection
+    # 1. Reject names that cannot be a table before making a round-trip
     if not table.isidentifier():
         return {"error": "Invalid table name."}
 
-    # 2. Build the SQL without a trailing semicolon
-    sql = (
-        f"SELECT column_name, data_type "
-        f"FROM information_schema.columns "
-        f"WHERE table_schema = 'public' AND table_name = '{table}'"
-    )
-
-    # 3. Call the RPC, catching any execution errors
+    # 2. Call the RPC, catching any execution errors
+    # Reason: The table name is bound as a parameter (see supabase_functions.sql), so nothing
+    # is interpolated into SQL and Postgres can reuse the plan across tables.
     try:
-        response = supabase.rpc("execute_sql", {"query_text": sql}).execute()
+        supabase = await get_supabase()
+        response = await supabase.rpc("get_columns", {"tbl": table}).execute()
         data = response.data
     except Exception as e:
         return {"error": f"Error executing SQL: {str(e)}"}
 
-    # 4. Validate that we received a non-empty list
+    # 3. Validate that we received a non-empty list
     if not data or not isinstance(data, list):
         return {"error": f"No schema found for table '{table}'."}
 
-    # 5. Unpack the JSONB array from the first element
-    if not data:
-        return {"data": []}
     # Return the data as a list of dicts with 'column_name' and 'data_type'
     return {"data": [
-        {"column_name": col["column_name"], "data_type": col["data_type"]}
-        for col in data
+        {"column_name": name, "data_type": data_type}
+        for name, data_type in map(itemgetter("column_name", "data_type"), data)
     ]}
 
 @mcp.tool()
-def get_row_count(table: str) -> int:
+async def get_row_count(table: str, exact: bool = False) -> int:
     """
-    Get the number of rows in a table.
+    Get an approximate number of rows in a table, or the exact count when exact=True.
 
     Args:
         table (str): Table name.
+        exact (bool): Count every row instead of using the planner's estimate (default False).
 
     Returns:
-        int: Number of rows in the table.
+        int: Estimated number of rows, or the exact number if `exact` is True.
     """
-    sql = f"SELECT COUNT(*) as count FROM {table};"
-    result = supabase.rpc("execute_sql", {"sql": sql}).execute()
-    if not result.data or not isinstance(result.data, list):
-        return 0
-    return result.data[0].get("count", 0)
+    if not table.isidentifier():
+        raise ValueError("Invalid table name.")
+    # Reason: A HEAD request returns only the count in Content-Range, without any rows. The
+    # "estimated" count reads pg_class statistics for large tables instead of scanning them.
+    supabase = await get_supabase()
+    result = await supabase.table(table).select("*", count="exact" if exact else "estimated", head=True).execute()
+    return result.count or 0
 
 @mcp.tool()
-def get_table_sample(table: str, limit: int = 5) -> Any:
+async def get_table_sample(table: str, limit: int = 5) -> Any:
     """
     Get a sample of rows from a table.
 
@@ -242,11 +246,12 @@ def get_table_sample(table: str, limit: int = 5) -> Any:
     Returns:
         Any: List of sample rows.
     """
-    result = supabase.table(table).select("*").limit(limit).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(table).select("*").limit(limit).execute()
     return result.data
 
 @mcp.tool()
-def bulk_insert(request: BulkInsertRequest) -> TableRowResponse:
+async def bulk_insert(request: BulkInsertRequest) -> TableRowResponse:
     """
     Insert multiple rows into a Supabase table.
 
@@ -256,11 +261,31 @@ def bulk_insert(request: BulkInsertRequest) -> TableRowResponse:
     Returns:
         TableRowResponse: Inserted rows data or error.
     """
-    result = supabase.table(request.table).insert(request.rows).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).insert(request.rows).execute()
+    return TableRowResponse(data=result.data)
+
+@mcp.tool()
+async def bulk_upsert(request: BulkUpsertRequest) -> TableRowResponse:
+    """
+    Insert or update multiple rows in a Supabase table in a single request.
+
+    Prefer this over calling insert_row in a loop: all rows go in one round-trip, and
+    retrying or re-loading the same rows updates them instead of duplicating them.
+
+    Args:
+        request (BulkUpsertRequest): Table name, list of row data, and the conflict column(s).
+
+    Returns:
+        TableRowResponse: Upserted rows data or error.
+    """
+    # Reason: PostgREST upserts via Prefer: resolution=merge-duplicates on the on_conflict key.
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).upsert(request.rows, on_conflict=request.on_conflict).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def bulk_update(request: BulkUpdateRequest) -> TableRowResponse:
+async def bulk_update(request: BulkUpdateRequest) -> TableRowResponse:
     """
     Update multiple rows in a Supabase table matching criteria.
 
@@ -270,27 +295,37 @@ def bulk_update(request: BulkUpdateRequest) -> TableRowResponse:
     Returns:
         TableRowResponse: Updated rows data or error.
     """
-    result = supabase.table(request.table).update(request.values).match(request.match).execute()
+    supabase = await get_supabase()
+    result = await supabase.table(request.table).update(request.values).match(request.match).execute()
     return TableRowResponse(data=result.data)
 
 @mcp.tool()
-def search_rows(request: SearchRequest) -> TableRowResponse:
+async def search_rows(request: SearchRequest) -> TableRowResponse:
     """
-    Search for rows in a table where a column contains a query string (case-insensitive).
+    Search for rows in a table where a column contains, or starts with, a query string
+    (case-insensitive).
 
     Args:
-        request (SearchRequest): Table name, column, query string, and optional limit.
+        request (SearchRequest): Table name, column, query string, optional limit, and
+            whether to match only values starting with the query.
 
     Returns:
         TableRowResponse: Matching rows.
     """
-    result = (
-        supabase.table(request.table)
-        .select("*")
-        .ilike(request.column, f"%{request.query}%")
-        .limit(request.limit)
-        .execute()
-    )
+    # Reason: ILIKE cannot use a B-tree index even when anchored; search_table
+    # (supabase_functions.sql) runs both patterns against a pg_trgm GIN index and ranks
+    # matches by similarity.
+    supabase = await get_supabase()
+    result = await supabase.rpc(
+        "search_table",
+        {
+            "tbl": request.table,
+            "col": request.column,
+            "q": request.query,
+            "lim": request.limit,
+            "prefix": request.prefix,
+        },
+    ).execute()
     return TableRowResponse(data=result.data)
 
 # --- Main entry ---
@@ -298,9 +333,17 @@ if __name__ == "__main__":
     transport = "stdio"
     if transport == "stdio":
         print("Running server with stdio transport")
-        mcp.run(transport="stdio")
+        asyncio.run(run_stdio(mcp))
+    elif transport == "streamable-http":
+        print("Running server with Streamable HTTP transport (legacy SSE at /sse)")
+        # Reason: Streamable HTTP answers one-shot tool calls without holding an event stream
+        # open. The SSE routes stay on the same app for clients that have not migrated yet.
+        app = with_supabase_pool(mcp.streamable_http_app())
+        app.router.routes.extend(mcp.sse_app().routes)
+        uvicorn.run(app, host=mcp.settings.host, port=mcp.settings.port)
     elif transport == "sse":
         print("Running server with SSE transport")
-        mcp.run(transport="sse")
+        app = with_supabase_pool(mcp.sse_app())
+        uvicorn.run(app, host=mcp.settings.host, port=mcp.settings.port)
     else:
         raise ValueError(f"Unknown transport: {transport}")
@@ -0,0 +1,38 @@
+-- SQL functions called over RPC by the Supabase MCP server (server.py).
+-- Run this file once in the Supabase SQL editor.
+
+create extension if not exists pg_trgm;
+
+-- Case-insensitive substring search (or prefix search with prefix => true), ranked by
+-- trigram similarity. ILIKE cannot use a B-tree index, anchored or not, so give each
+-- searched column a trigram GIN index, which the planner can use for both patterns:
+--   create index if not exists <table>_<column>_trgm_idx
+--     on public.<table> using gin (<column> gin_trgm_ops);
+drop function if exists search_table(text, text, text, int);
+create or replace function search_table(
+  tbl text, col text, q text, lim int default 10, prefix boolean default false
+)
+returns setof jsonb
+language plpgsql
+stable
+as $$
+begin
+  return query execute format(
+    'select to_jsonb(t) from public.%I t where t.%I ilike $1 order by similarity(t.%I, $2) desc limit $3',
+    tbl, col, col
+  ) using case when prefix then q || '%' else '%' || q || '%' end, q, lim;
+end;
+$$;
+
+-- Column names and types of a public table. The table name is a bound parameter, so
+-- the plan is reused across tables instead of being re-planned per interpolated query.
+create or replace function get_columns(tbl text)
+returns table(column_name text, data_type text)
+language sql
+stable
+as $$
+  select c.column_name::text, c.data_type::text
+  from information_schema.columns c
+  where c.table_schema = 'public' and c.table_name = tbl
+  order by c.ordinal_position;
+$$;
@@ -0,0 +1,180 @@
+"""
+Shared async Supabase client and connection pool for the Supabase MCP server.
+
+Owns the client's lifecycle: lazy creation, warm-up at server startup, and a single
+close at shutdown, for both stdio and HTTP transports.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+import httpx
+from mcp.server.fastmcp import FastMCP
+from starlette.applications import Starlette
+from supabase import AsyncClient, acreate_client
+
+logger = logging.getLogger(__name__)
+
+# Reason: The async client lets tool calls await network I/O instead of blocking the
+# event loop. It must be awaited to construct, so it is created lazily on first use.
+_supabase: Optional[AsyncClient] = None
+_supabase_lock = asyncio.Lock()
+
+# Reason: Keep-alive connections spare each tool call a TCP/TLS handshake, and the bounded
+# pool caps concurrent sockets. httpx ignores client-level limits when a transport is given,
+# so they are set on the transport itself. http2=True requires the `httpx[http2]` extra.
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+def _build_http_client(postgrest: Any) -> httpx.AsyncClient:
+    """
+    Build a pooled HTTP client that talks to the same PostgREST endpoint as `postgrest`.
+
+    Args:
+        postgrest (AsyncPostgrestClient): The PostgREST client created by Supabase.
+
+    Returns:
+        httpx.AsyncClient: A client with tuned keep-alive and connection limits.
+    """
+    # Reason: TLS verification and proxy live on the transport, so replacing the transport
+    # would silently drop them; carry over whatever the PostgREST client was built with.
+    transport = httpx.AsyncHTTPTransport(
+        limits=HTTP_LIMITS,
+        http2=True,
+        retries=2,
+        verify=getattr(postgrest, "verify", True),
+        proxy=getattr(postgrest, "proxy", None),
+    )
+    session = postgrest.session
+    return httpx.AsyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        transport=transport,
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    )
+
+
+async def get_supabase() -> AsyncClient:
+    """
+    Return the shared async Supabase client, creating it on first use.
+
+    Returns:
+        AsyncClient: The shared Supabase client.
+    """
+    global _supabase
+    if _supabase is None:
+        async with _supabase_lock:
+            # Reason: Another coroutine may have created the client while we waited.
+            if _supabase is None:
+                client = await acreate_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+                # Reason: table() and rpc() both go through the PostgREST session.
+                default_session = client.postgrest.session
+                client.postgrest.session = _build_http_client(client.postgrest)
+                await default_session.aclose()
+                _supabase = client
+    return _supabase
+
+
+async def close_supabase() -> None:
+    """
+    Close the shared Supabase client's connection pool, if it was opened.
+    """
+    global _supabase
+    async with _supabase_lock:
+        client, _supabase = _supabase, None
+    # Reason: The client is detached before closing, so a concurrent get_supabase()
+    # builds a fresh client instead of receiving one that is being closed.
+    if client is not None:
+        await client.postgrest.aclose()
+
+
+async def warm_up_supabase() -> None:
+    """
+    Open a pooled connection before the first tool call and check the credentials.
+
+    Raises:
+        RuntimeError: If the Supabase API gateway rejects the configured key.
+    """
+    # Reason: A cheap RPC moves DNS and TLS setup out of the first tool call. It is sent
+    # through the raw session because postgrest's APIError does not reliably carry the
+    # HTTP status. Only a rejected key is fatal; anything else is logged and the tools
+    # still get a chance to work.
+    try:
+        supabase = await get_supabase()
+        response = await supabase.postgrest.session.post("/rpc/list_public_tables", json={})
+    except Exception as e:
+        logger.warning("Supabase warm-up failed: %s", e)
+        return
+    if not response.is_error:
+        return
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    # Reason: PostgREST errors always carry a `code` (e.g. 42501 when the role may not
+    # execute this function) and do not mean the key is bad. A 401/403 without one comes
+    # from the API gateway, e.g. "Invalid API key", and every tool call would fail too.
+    if response.status_code in (401, 403) and "code" not in body:
+        message = body.get("message") or response.text
+        # Reason: Over stdio the client only sees a failed initialize(), so log the cause.
+        logger.error("Supabase rejected the configured key (HTTP %s): %s", response.status_code, message)
+        raise RuntimeError(f"Supabase rejected the configured key (HTTP {response.status_code}): {message}")
+    logger.warning(
+        "Supabase warm-up returned HTTP %s: %s", response.status_code, body.get("message") or response.text
+    )
+
+
+@asynccontextmanager
+async def supabase_pool() -> AsyncIterator[None]:
+    """
+    Own the shared Supabase connection pool for the lifetime of the server process.
+
+    Yields:
+        None
+    """
+    await warm_up_supabase()
+    try:
+        yield
+    finally:
+        await close_supabase()
+
+
+def with_supabase_pool(app: Starlette) -> Starlette:
+    """
+    Run the Supabase connection pool inside an HTTP app's own lifespan.
+
+    Args:
+        app (Starlette): The app built by FastMCP.
+
+    Returns:
+        Starlette: The same app, now opening the pool on startup and closing it on shutdown.
+    """
+    # Reason: FastMCP's lifespan runs once per client session on HTTP transports, so the pool
+    # is tied to the app lifespan instead and survives clients connecting and disconnecting.
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[Any]:
+        async with app_lifespan(app) as state:
+            async with supabase_pool():
+                yield state
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+async def run_stdio(server: FastMCP) -> None:
+    """
+    Serve an MCP server over stdio with the Supabase connection pool open.
+
+    Args:
+        server (FastMCP): The MCP server to run.
+    """
+    async with supabase_pool():
+        await server.run_stdio_async()